@@ -1,29 +1,68 @@
 from __future__ import annotations
 
+import asyncio
+import collections
+import contextlib
 import csv
 import dataclasses
 import datetime
-import json
 import math
 import sqlite3
+import sys
+import time
 import typing
+import urllib.parse
 import zlib
 
 import haversine
-import requests
+import httpx
+import numpy as np
+import orjson
+import zstandard
+
+# HTTP/2 lets many requests share one connection, but httpx only supports it
+# if the optional h2 package is installed; fall back to HTTP/1.1 without it
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# subdivision IDs encode the path through the recursion tree as an integer,
+# with one hexadecimal digit per level following a leading 1
+T_SubdivisionID = int
+T_Subdivision = typing.Tuple["Rectangle", T_SubdivisionID]
+
+# prefixes identifying how a stored blob was compressed; blobs without a
+# prefix were written by older versions and are zlib-compressed
+BLOB_ZSTD = b"\x01"
+BLOB_ZSTD_DICT = b"\x02"
+
+
+@dataclasses.dataclass(frozen=True)
+class Rectangle:
+    """ Data class for storing a rectangle and related functions.
 
-T_SubdivisionID = typing.List[int]
+    Rectangles are immutable and hashable, and use slots rather than a
+    per-instance dict, as large numbers of them are created when subdividing.
+    """
 
-
-@dataclasses.dataclass
-class Rectangle:
-    """ Data class for storing a rectangle and related functions. """
+    __slots__ = ("min_x", "min_y", "max_x", "max_y")
 
     min_x: float
     min_y: float
     max_x: float
     max_y: float
 
+    # without a per-instance dict, pickle and copy need to be told how to
+    # save and restore the fields, which must bypass frozen's __setattr__
+    def __getstate__(self) -> typing.Tuple[float, float, float, float]:
+        return self.to_tuple()
+
+    def __setstate__(self, state: typing.Tuple[float, float, float, float]):
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
     @property
     def centroid(self) -> typing.Tuple[float, float]:
         """ Calculate the average x and y.
@@ -55,11 +94,47 @@ class Rectangle:
             )
         else:
             return haversine.haversine(
-                (self.min_x, self.min_y),
-                (self.max_x, self.max_y),
+                (self.min_y, self.min_x),
+                (self.max_y, self.max_x),
                 unit
             )
 
+    def max_subdivision_radius(self,
+                               rows: int,
+                               columns: int,
+                               unit: typing.Optional[haversine.Unit] = None
+                               ) -> float:
+        """ Calculate the largest radius of the subdivisions that would be
+        produced by subdividing this Rectangle into the given number of rows
+        and columns; see Rectangle.radius.
+
+        Args:
+            rows: The number of rows to subdivide this Rectangle into.
+            columns: The number of columns to subdivide this Rectangle into.
+            unit: If specified, output in these units, using the haversine
+                formula to account for curvature.
+
+        Returns: The maximum radius of the subdivisions, as a float.
+        """
+
+        subdivision_width = (self.max_x - self.min_x) / columns
+        subdivision_height = (self.max_y - self.min_y) / rows
+
+        if unit is None:
+            return math.sqrt(subdivision_width**2 + subdivision_height**2)
+
+        # subdivisions in the same row are the same size, so only the first
+        # column needs to be checked; all rows are checked at once
+        min_ys = self.min_y + subdivision_height * np.arange(rows)
+        return haversine.haversine_vector(
+            np.column_stack((min_ys, np.full(rows, self.min_x))),
+            np.column_stack((
+                min_ys + subdivision_height,
+                np.full(rows, self.min_x + subdivision_width)
+            )),
+            unit
+        ).max()
+
     def to_tuple(self) -> typing.Tuple[float, float, float, float]:
         """ Convert the Rectangle into a tuple of floats in standard GIS format.
 
@@ -68,6 +143,114 @@ class Rectangle:
 
         return self.min_x, self.min_y, self.max_x, self.max_y
 
+    def subdivision_depth(self,
+                          rows: int,
+                          columns: typing.Optional[int] = None,
+                          max_radius: typing.Optional[float] = None,
+                          max_radius_units: typing.Optional[haversine.Unit] = None
+                          ) -> int:
+        """ Calculate how many times this Rectangle must be subdivided for
+        every subdivision to be within max_radius; see
+        Rectangle.subdivide_array.
+
+        Args:
+            rows: The number of rows to subdivide this Rectangle into.
+            columns: The number of columns to subdivide this Rectangle into. If
+                blank, uses the number of rows.
+            max_radius: If specified, the maximum radius of every subdivision.
+            max_radius_units: The units of max_radius; see Rectangle.radius.
+
+        Returns: The number of times to subdivide, which is at least 1.
+        """
+
+        if columns is None:
+            columns = rows
+
+        # find how many times the rectangle must be subdivided: estimate this
+        # from the radius of the whole rectangle, assuming that each
+        # subdivision shrinks it by the larger of rows and columns, then
+        # correct the estimate for curvature and uneven subdivisions
+        depth = 1
+        if max_radius:
+            radius = self.max_subdivision_radius(1, 1, max_radius_units)
+            if radius > max_radius and max(rows, columns) > 1:
+                depth = max(1, math.ceil(
+                    math.log(radius / max_radius, max(rows, columns))
+                ))
+            while depth > 1 and self.max_subdivision_radius(
+                rows ** (depth - 1), columns ** (depth - 1), max_radius_units
+            ) <= max_radius:
+                depth -= 1
+            while self.max_subdivision_radius(
+                rows ** depth, columns ** depth, max_radius_units
+            ) > max_radius:
+                depth += 1
+
+        return depth
+
+    def subdivide_array(self,
+                        rows: int,
+                        columns: typing.Optional[int] = None,
+                        max_radius: typing.Optional[float] = None,
+                        max_radius_units: typing.Optional[haversine.Unit] = None,
+                        depth: typing.Optional[int] = None
+                        ) -> np.ndarray:
+        """ Subdivide this Rectangle into an array of smaller rectangles, each
+        of equal size.
+
+        If max_radius is given, the Rectangle is subdivided repeatedly until
+        the subdivisions are small enough. Subdivisions are listed in the
+        order that subdividing each subdivision in turn would produce, i.e.
+        the subdivisions of each subdivision are contiguous.
+
+        Args:
+            rows: The number of rows to subdivide this Rectangle into.
+            columns: The number of columns to subdivide this Rectangle into. If
+                blank, uses the number of rows.
+            max_radius: If specified, the maximum radius of every subdivision.
+            max_radius_units: The units of max_radius; see Rectangle.radius.
+            depth: If specified, the number of times to subdivide, as already
+                calculated by Rectangle.subdivision_depth; max_radius is then
+                ignored.
+
+        Returns: An (n, 4) array of floats, with one row per subdivision in the
+            same format as Rectangle.to_tuple.
+        """
+
+        if columns is None:
+            columns = rows
+        if depth is None:
+            depth = self.subdivision_depth(
+                rows, columns, max_radius, max_radius_units
+            )
+
+        width = self.max_x - self.min_x
+        height = self.max_y - self.min_y
+
+        subdivision_width = width / columns ** depth
+        subdivision_height = height / rows ** depth
+
+        # each index is a number with one digit per depth, identifying which
+        # subdivision it falls in at that depth
+        n_children = rows * columns
+        indices = np.arange(n_children ** depth)
+        subdivision_rows = np.zeros_like(indices)
+        subdivision_columns = np.zeros_like(indices)
+        for level in reversed(range(depth)):
+            digit_rows, digit_columns = np.divmod(
+                indices // n_children ** level % n_children, columns
+            )
+            subdivision_rows = subdivision_rows * rows + digit_rows
+            subdivision_columns = subdivision_columns * columns + digit_columns
+
+        # compute the bounds of all subdivisions at once
+        return np.column_stack((
+            self.min_x + subdivision_width * subdivision_columns,
+            self.min_y + subdivision_height * subdivision_rows,
+            self.min_x + subdivision_width * (subdivision_columns + 1),
+            self.min_y + subdivision_height * (subdivision_rows + 1)
+        ))
+
     def subdivide(self,
                   rows: int,
                   columns: typing.Optional[int] = None,
@@ -75,48 +258,143 @@ class Rectangle:
                   max_radius_units: typing.Optional[haversine.Unit] = None
                   ) -> typing.List[Rectangle]:
         """ Subdivide this Rectangle into a list of smaller rectangles, each of
-        equal size.
+        equal size; see Rectangle.subdivide_array.
 
         Args:
             rows: The number of rows to subdivide this Rectangle into.
             columns: The number of columns to subdivide this Rectangle into. If
                 blank, uses the number of rows.
+            max_radius: If specified, the maximum radius of each subdivision.
+            max_radius_units: The units of max_radius; see Rectangle.radius.
 
         Returns: A list of smaller Rectangle objects.
         """
 
-        if columns is None:
-            columns = rows
+        return [
+            Rectangle(*bounds)
+            for bounds in self.subdivide_array(
+                rows, columns, max_radius, max_radius_units
+            ).tolist()
+        ]
 
-        rect_width = self.max_x - self.min_x
-        rect_height = self.max_y - self.min_y
-        subdivisions = []
-
-        for n in range(rows * columns):
-            subdivision_width = rect_width / columns
-            subdivision_height = rect_height / rows
-            subdivision_row = int(n / columns)
-            subdivision_column = n % columns
-            subdivisions.append(Rectangle(
-                self.min_x + subdivision_width * subdivision_column,
-                self.min_y + subdivision_height * subdivision_row,
-                self.min_x + subdivision_width * (subdivision_column + 1),
-                self.min_y + subdivision_height * (subdivision_row + 1)
-            ))
 
-        if max_radius and (subdivisions[0].radius(max_radius_units) > max_radius):
-            subdivisions = [
-                new_subdivision
-                for subdivision in subdivisions
-                for new_subdivision in subdivision.subdivide(
-                    rows, columns, max_radius, max_radius_units
-                )
-            ]
+class HerePlacesBase:
+    """ Base class providing a shared asynchronous HTTP client for the HERE
+    APIs.
+
+    The client is only available inside an `async with` block, which ensures
+    that it is bound to the running event loop and closed afterwards.
+    """
+
+    # responses that are retried, with exponential backoff, before giving up
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    MAX_RETRIES = 3
+    RETRY_BACKOFF = 0.5
+
+    def __init__(self,
+                 concurrency: int = 10,
+                 rate_limit: typing.Optional[float] = None):
+        """ Initialize HerePlacesBase object.
+
+        Args:
+            concurrency: The maximum number of requests that may be in flight
+                at any given time.
+            rate_limit: If specified, the maximum number of requests to start
+                per second.
+        """
 
-        return subdivisions
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1, got {}".format(concurrency))
+        if rate_limit is not None and not rate_limit > 0:
+            raise ValueError("rate_limit must be positive, got {}".format(rate_limit))
+
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        self._client: typing.Optional[httpx.AsyncClient] = None
+        self._sem: typing.Optional[asyncio.Semaphore] = None
+        self._rate_lock: typing.Optional[asyncio.Lock] = None
+        self._next_request_time = 0.0
+
+    async def __aenter__(self) -> HerePlacesBase:
+        self._client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(
+                http2=HTTP2_AVAILABLE,
+                # every request that may be in flight keeps its connection
+                # alive for reuse by the next
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency
+                ),
+                retries=self.MAX_RETRIES
+            )
+        )
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._rate_lock = asyncio.Lock()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+        self._sem = None
+        self._rate_lock = None
+
+    async def _wait_for_rate_limit(self):
+        """ Wait until another request may be started without exceeding the
+        rate limit.
+        """
+
+        if self.rate_limit is None:
+            return
+
+        async with self._rate_lock:
+            now = asyncio.get_running_loop().time()
+            if self._next_request_time > now:
+                await asyncio.sleep(self._next_request_time - now)
+            self._next_request_time = max(now, self._next_request_time) + 1 / self.rate_limit
+
+    async def _get(self,
+                   url: str,
+                   params: typing.Optional[dict] = None
+                   ) -> dict:
+        """ Make a GET request, respecting the concurrency and rate limits and
+        retrying connection failures, rate limiting and server errors.
+
+        Args:
+            url: The URL to request.
+            params: Any query parameters to send in addition to those already
+                in the URL.
+
+        Returns: The decoded JSON response.
 
+        Raises:
+            httpx.HTTPStatusError: The request was unsuccessful, even after
+                any retries.
+        """
+
+        if self._client is None:
+            raise Exception("{} must be used in an `async with` block".format(
+                type(self).__name__
+            ))
+
+        async with self._sem:
+            for attempt in range(self.MAX_RETRIES + 1):
+                await self._wait_for_rate_limit()
+                response = await self._client.get(url, params=params)
+                if (response.status_code not in self.RETRY_STATUSES
+                        or attempt == self.MAX_RETRIES):
+                    break
+                await asyncio.sleep(self.RETRY_BACKOFF * 2 ** attempt)
+        if response.status_code != 200:
+            # the URL is left out of the message, as it contains credentials
+            raise httpx.HTTPStatusError(
+                "HTTP {} {}".format(response.status_code, response.reason_phrase),
+                request=response.request,
+                response=response
+            )
+        return orjson.loads(response.content)
 
-class HerePlacesV1:
+
+class HerePlacesV1(HerePlacesBase):
     """ **DEPRECATED**: Class providing access to the HERE Places API v1.
 
     Use of the v1 API has been deprecated by HERE; see HerePlaces for the v7
@@ -126,22 +404,31 @@ class HerePlacesV1:
     BASE_URL = "https://places.api.here.com/places/v1/"
     BROWSE_ENDPOINT = "{}/browse".format(BASE_URL)
 
-    def __init__(self, app_id: str, app_code: str):
+    def __init__(self,
+                 app_id: str,
+                 app_code: str,
+                 concurrency: int = 10,
+                 rate_limit: typing.Optional[float] = None):
         """ Initialize HerePlacesV1 object.
 
         Args:
             app_id: The HERE APP ID to use for the Places API.
             app_code: The HERE APP code to use for the Places API.
+            concurrency: The maximum number of requests that may be in flight
+                at any given time.
+            rate_limit: If specified, the maximum number of requests to start
+                per second.
         """
 
+        super().__init__(concurrency, rate_limit)
         self.app_id = app_id
         self.app_code = app_code
 
-    def browse(self,
-               in_: Rectangle,
-               size: int = 100,
-               cat: typing.Optional[typing.Union[str, typing.List[str]]] = None
-               ) -> typing.Optional[typing.List[dict]]:
+    async def browse(self,
+                     in_: Rectangle,
+                     size: int = 100,
+                     cat: typing.Optional[typing.Union[str, typing.List[str]]] = None
+                     ) -> typing.Optional[typing.List[dict]]:
         """ Browse for places in a given area.
 
         Args:
@@ -153,8 +440,10 @@ class HerePlacesV1:
                 a list of categories, see:
                 https://developer.here.com/documentation/places/dev_guide/topics/categories.html
 
-        Returns: A list of HERE places if the request was successful; otherwise,
-            None. Each place is a dict.
+        Returns: A list of HERE places. Each place is a dict.
+
+        Raises:
+            httpx.HTTPStatusError: The request was unsuccessful.
         """
 
         params = {
@@ -170,30 +459,60 @@ class HerePlacesV1:
             else:
                 params.update({"cat": ",".join(cat)})
 
-        response = requests.get(self.BROWSE_ENDPOINT, params=params)
-        if response.status_code == 200:
-            return response.json()["results"]["items"]
+        response = await self._get(self.BROWSE_ENDPOINT, params)
+        return response["results"]["items"]
 
 
-class HerePlacesV7:
+class HerePlacesV7(HerePlacesBase):
     """ Class providing access to the HERE Geocoding & Search API v7. """
 
     BROWSE_ENDPOINT = "https://browse.search.hereapi.com/v1/browse"
 
-    def __init__(self, api_key: str):
+    def __init__(self,
+                 api_key: str,
+                 concurrency: int = 10,
+                 rate_limit: typing.Optional[float] = None):
         """ Initialize HerePlacesV7 object.
 
         Args:
             api_key: The HERE API key to use for the Geocoding & Search API.
+            concurrency: The maximum number of requests that may be in flight
+                at any given time.
+            rate_limit: If specified, the maximum number of requests to start
+                per second.
         """
 
+        super().__init__(concurrency, rate_limit)
         self.api_key = api_key
+        self._browse_url_templates: typing.Dict[typing.Tuple[int, typing.Optional[str]], str] = {}
 
-    def browse(self,
-               rect: Rectangle,
-               limit: int = 100,
-               cat: typing.Optional[typing.Union[str, typing.List[str]]] = None
-               ) -> typing.Optional[typing.List[dict]]:
+    def _get_browse_url_template(self, limit: int, cat: typing.Optional[str]) -> str:
+        """ Get a browse URL with all parameters except the location already
+        encoded.
+
+        Args:
+            limit: The maximum number of places to be returned.
+            cat: A comma-separated list of categories, if any.
+
+        Returns: A URL template with replacement fields for the `at` and `in`
+            parameters.
+        """
+
+        key = (limit, cat)
+        if key not in self._browse_url_templates:
+            params = {"apiKey": self.api_key, "limit": limit}
+            if cat is not None:
+                params["cat"] = cat
+            self._browse_url_templates[key] = "{}?{}&at={{}},{{}}&in=bbox:{{}},{{}},{{}},{{}}".format(
+                self.BROWSE_ENDPOINT, urllib.parse.urlencode(params)
+            )
+        return self._browse_url_templates[key]
+
+    async def browse(self,
+                     rect: Rectangle,
+                     limit: int = 100,
+                     cat: typing.Optional[typing.Union[str, typing.List[str]]] = None
+                     ) -> typing.Optional[typing.List[dict]]:
         """ Browse for places in a given area.
 
         Args:
@@ -205,27 +524,22 @@ class HerePlacesV7:
                 a list of categories, see:
                 https://developer.here.com/documentation/places/dev_guide/topics/categories.html
 
-        Returns: A list of HERE places if the request was successful; otherwise,
-            None. Each place is a dict.
+        Returns: A list of HERE places. Each place is a dict.
+
+        Raises:
+            httpx.HTTPStatusError: The request was unsuccessful.
         """
 
-        centroid = rect.centroid
-        params = {
-            "apiKey": self.api_key,
-            "at": "{},{}".format(centroid[1], centroid[0]),
-            "in": "bbox:{},{},{},{}".format(*rect.to_tuple()),
-            "limit": limit
-        }
+        if cat is not None and type(cat) is not str:
+            cat = ",".join(cat)
 
-        if cat is not None:
-            if type(cat) is str:
-                params.update({"cat": cat})
-            else:
-                params.update({"cat": ",".join(cat)})
+        centroid = rect.centroid
+        url = self._get_browse_url_template(limit, cat).format(
+            centroid[1], centroid[0], *rect.to_tuple()
+        )
 
-        response = requests.get(self.BROWSE_ENDPOINT, params=params)
-        if response.status_code == 200:
-            return response.json()["items"]
+        response = await self._get(url)
+        return response["items"]
 
 #%%
 
@@ -237,14 +551,87 @@ class HerePlacesScraper:
     # to be safe, we will limit this further to only 240km
     MAX_RADIUS_KM = 240
 
+    # rectangles are subdivided into SUBDIVISION_ROWS x SUBDIVISION_ROWS
+    # subdivisions, each of which must be identifiable by one hex digit
+    SUBDIVISION_ROWS = 3
+    ROOT_SUBDIVISION_ID = 1
+
+    # subdivisions that are too dense to scrape in one request are not
+    # subdivided further once they are MAX_SUBDIVISION_DEPTH levels deep, so
+    # that subdivision IDs fit in SQLite's 64-bit integers, or once their
+    # subdivisions would be less than MIN_SUBDIVISION_SIZE degrees across,
+    # as places that close together usually share one location
+    MAX_SUBDIVISION_DEPTH = 15
+    MIN_SUBDIVISION_SIZE = 1e-5
+
     # max number of categories to export in CSV
     MAX_CATEGORIES = 5
 
+    # SQLite tuning applied to every connection: write-ahead logging lets
+    # commits skip the rollback journal and only fsync at checkpoints
+    PRAGMAS = (
+        "journal_mode=WAL",
+        "synchronous=NORMAL",
+        "temp_store=MEMORY",
+        "cache_size=-65536",
+        "mmap_size=268435456",
+        "wal_autocheckpoint=1000",
+    )
+
+    # a running scrape commits its progress as soon as it has stored
+    # COMMIT_INTERVAL new places, finished COMMIT_INTERVAL_SUBDIVISIONS
+    # subdivisions or run for COMMIT_INTERVAL_SECONDS since it last committed
+    COMMIT_INTERVAL = 500
+    COMMIT_INTERVAL_SUBDIVISIONS = 100
+    COMMIT_INTERVAL_SECONDS = 30
+
+    # size of the buffer used when exporting data
+    WRITE_BUFFER_SIZE = 1 << 20
+
+    # progress messages written while scraping, if verbose
+    MESSAGE_RESUMING = "Resuming scrape: {} subdivisions pending\n\n"
+    MESSAGE_CACHED = (
+        "Subdivision ID: {}\n"
+        "Bounding box: {},{},{},{}\n"
+        "Recently requested: found {} places\n\n"
+    )
+    MESSAGE_FAILED = (
+        "Subdivision ID: {}\n"
+        "Request failed: {}\n\n"
+    )
+    MESSAGE_SCRAPED = (
+        "Subdivision ID: {}\n"
+        "Bounding box: {},{},{},{}\n"
+        "In this subdivision: found {} places ({} new)\n"
+        "Since scraping started: made {} requests; encountered {} places ({} new)\n\n"
+    )
+    MESSAGE_TOO_DENSE = (
+        "Subdivision ID: {}\n"
+        "Too dense to scrape completely, but too small to subdivide further\n\n"
+    )
+    MESSAGE_N_FAILED = "{} requests failed; scrape again to retry them\n"
+    MESSAGE_N_TOO_DENSE = "{} subdivisions were too dense to scrape completely\n"
+
+    # default for how long a response stays fresh; subdivisions requested
+    # within this time are not requested again, since their places are
+    # already stored
+    RESPONSE_TTL = datetime.timedelta(days=7)
+
+    # zstd compression level and trained dictionary parameters; the dictionary
+    # is trained once from the first places scraped into a database
+    ZSTD_LEVEL = 3
+    ZSTD_DICT_SIZE = 100_000
+    ZSTD_DICT_SAMPLES = 1000
+
     def __init__(self,
                  db_path: str,
                  api_key: typing.Optional[str] = None,
                  app_id: typing.Optional[str] = None,
-                 app_code: typing.Optional[str] = None):
+                 app_code: typing.Optional[str] = None,
+                 concurrency: int = 10,
+                 rate_limit: typing.Optional[float] = None,
+                 verbose: bool = True,
+                 response_ttl: datetime.timedelta = RESPONSE_TTL):
         """ Initialize a new Scraper object.
 
         Args:
@@ -253,14 +640,25 @@ class HerePlacesScraper:
             app_id: The HERE APP ID to use for the Places API.
             app_code: The HERE APP code to use for the Places API.
             api_key: The HERE API key to use for the Geocoding & Search API.
+            concurrency: The maximum number of HERE API requests that may be in
+                flight at any given time.
+            rate_limit: If specified, the maximum number of HERE API requests
+                to start per second.
+            verbose: Whether to write progress messages to stdout while
+                scraping.
+            response_ttl: How long a response stays fresh; subdivisions
+                requested within this time are not requested again. Use a
+                timedelta of 0 to request every subdivision again.
         """
 
         self.db_path = db_path
+        self.verbose = verbose
+        self.response_ttl = response_ttl
 
         if app_id and app_code:
-            self.here = HerePlacesV1(app_id, app_code)
+            self.here = HerePlacesV1(app_id, app_code, concurrency, rate_limit)
         elif api_key:
-            self.here = HerePlacesV7(api_key)
+            self.here = HerePlacesV7(api_key, concurrency, rate_limit)
         else:
             print("WARNING: no authentication provided; scraping not possible")
             self.here = None
@@ -268,15 +666,206 @@ class HerePlacesScraper:
         self.n_requests_made = 0
         self.n_places_encountered = 0
         self.n_total_new_places = 0
+        self.n_too_dense_subdivisions = 0
+
+        # progress of a running scrape since it last committed
+        self._reset_commit_interval()
+
+        # transactions are managed explicitly; see _transaction
+        self.db = sqlite3.connect(db_path, isolation_level=None)
+        for pragma in self.PRAGMAS:
+            self.db.execute("PRAGMA {}".format(pragma))
 
-        self.db = sqlite3.connect(db_path)
+        # places are stored in batches, each holding the newline-delimited
+        # JSON of the new places from one response; places_idx records where
+        # each place is stored and is used to discard duplicates. places_idx
+        # is keyed directly on place_id so that lookups only touch one B-tree
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS batches(
+                batch_id INTEGER PRIMARY KEY,
+                data BLOB
+            )
+        """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS places_idx(
+                place_id TEXT PRIMARY KEY,
+                batch_id INTEGER,
+                batch_offset INTEGER
+            ) WITHOUT ROWID
+        """)
         self.db.execute("""
-            CREATE TABLE IF NOT EXISTS places(
-                place_id TEXT,
-                data BLOB,
-                UNIQUE(place_id)
+            CREATE TABLE IF NOT EXISTS scrape_state(
+                root TEXT,
+                subdivision_id INTEGER,
+                min_x REAL,
+                min_y REAL,
+                max_x REAL,
+                max_y REAL,
+                UNIQUE(root, subdivision_id)
             )
         """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses(
+                request_key TEXT PRIMARY KEY,
+                n_places INTEGER,
+                fetched REAL
+            )
+        """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS meta(
+                key TEXT PRIMARY KEY,
+                value BLOB
+            )
+        """)
+
+        self._zdict_samples = []
+        self._set_zstd_dict(self._get_meta("zstd_dict"))
+        self._migrate_places_table()
+
+    @contextlib.contextmanager
+    def _transaction(self, commit_on_interrupt: bool = False):
+        """ Run a block of statements in a single write transaction.
+
+        The write lock is taken up front with BEGIN IMMEDIATE, so the
+        transaction cannot fail partway through waiting to upgrade its lock.
+
+        Args:
+            commit_on_interrupt: If True, commit rather than roll back if the
+                block is cancelled or interrupted with Ctrl-C. This is only
+                safe if the block leaves the database consistent at every
+                point where it may be interrupted.
+        """
+
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException as e:
+            if commit_on_interrupt and isinstance(
+                e, (asyncio.CancelledError, KeyboardInterrupt)
+            ):
+                self.db.execute("COMMIT")
+            else:
+                self.db.execute("ROLLBACK")
+                # a dictionary trained in this transaction was not saved
+                self._set_zstd_dict(self._get_meta("zstd_dict"))
+            raise
+        self.db.execute("COMMIT")
+
+    def _get_meta(self, key: str) -> typing.Optional[typing.Any]:
+        """ Retrieve a value from the meta table.
+
+        Args:
+            key: The key to retrieve.
+
+        Returns: The stored value, or None if there is none.
+        """
+
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+
+    def _set_zstd_dict(self, zdict_data: typing.Optional[bytes]):
+        """ Set up the zstd compressor and decompressors.
+
+        Args:
+            zdict_data: A serialized zstd dictionary to compress with, if one
+                has been trained.
+        """
+
+        self._zdctx = zstandard.ZstdDecompressor()
+        if zdict_data is None:
+            self._zdict_dctx = None
+            self._zctx = zstandard.ZstdCompressor(level=self.ZSTD_LEVEL)
+            self._zprefix = BLOB_ZSTD
+        else:
+            zdict = zstandard.ZstdCompressionDict(zdict_data)
+            self._zdict_dctx = zstandard.ZstdDecompressor(dict_data=zdict)
+            self._zctx = zstandard.ZstdCompressor(
+                level=self.ZSTD_LEVEL, dict_data=zdict
+            )
+            self._zprefix = BLOB_ZSTD_DICT
+
+    def _train_zstd_dict(self):
+        """ Train a zstd dictionary from the sampled places, store it in the
+        meta table and compress all further places with it.
+        """
+
+        try:
+            zdict = zstandard.train_dictionary(
+                self.ZSTD_DICT_SIZE, self._zdict_samples
+            )
+        except zstandard.ZstdError:
+            # not enough variety in the samples yet; try again later
+            self._zdict_samples = []
+            return
+
+        self._zdict_samples = []
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta(key, value) VALUES(?, ?)",
+            ("zstd_dict", zdict.as_bytes())
+        )
+        self._set_zstd_dict(zdict.as_bytes())
+
+    def _migrate_places_table(self):
+        """ Repack places stored one per row by older versions of this scraper
+        into batches, then drop the old places table.
+
+        Places are copied in place ID order, so that every insert into
+        places_idx is an append to the end of its B-tree.
+        """
+
+        if self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'places'"
+        ).fetchone() is None:
+            return
+
+        with self._transaction():
+            cursor = self.db.execute(
+                "SELECT place_id, data FROM places ORDER BY place_id"
+            )
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                self._insert_batch(
+                    [place_id for (place_id, data) in rows],
+                    [self._decompress(data) for (place_id, data) in rows]
+                )
+            cursor.close()
+            self.db.execute("DROP TABLE places")
+
+    def _compress(self, data: bytes) -> bytes:
+        """ Compress data for storage in the database.
+
+        Args:
+            data: The data to compress.
+
+        Returns: The compressed data, prefixed with the compression format.
+        """
+
+        return self._zprefix + self._zctx.compress(data)
+
+    def _decompress(self, blob: bytes) -> bytes:
+        """ Decompress data stored in the database.
+
+        Args:
+            blob: The compressed data, as written by _compress or by older
+                versions of this scraper.
+
+        Returns: The decompressed data.
+        """
+
+        # the decompressors are created once and reuse their internal buffers;
+        # slicing a memoryview avoids also copying each blob to strip the prefix
+        prefix = blob[:1]
+        if prefix == BLOB_ZSTD_DICT:
+            return self._zdict_dctx.decompress(memoryview(blob)[1:])
+        elif prefix == BLOB_ZSTD:
+            return self._zdctx.decompress(memoryview(blob)[1:])
+        else:
+            return zlib.decompress(blob)
 
     def insert_places(self,
                       places: typing.List[dict],
@@ -284,8 +873,8 @@ class HerePlacesScraper:
                       ) -> int:
         """ Insert HERE places into the database.
 
-        Only new places are inserted, as per the UNIQUE constraint placed on
-        the place ID.
+        Only new places are inserted; these are packed together and stored as
+        a single batch.
 
         Args:
             places: A list of HERE places. Each HERE place should be a dict.
@@ -294,26 +883,109 @@ class HerePlacesScraper:
         Returns: The number of new places that were inserted into the database.
         """
 
-        n_inserted = 0
+        with self._transaction():
+            return self._insert_places(places, scraped_datetime)
+
+    def _insert_places(self,
+                       places: typing.List[dict],
+                       scraped_datetime: typing.Optional[datetime.datetime] = None
+                       ) -> int:
+        """ Insert HERE places into the database without managing the
+        transaction; see insert_places.
+        """
+
         if scraped_datetime is not None:
             scraped_datetime = scraped_datetime.timestamp()
 
-        with self.db:
-            for place in places:
-                place["scraped"] = scraped_datetime
-                try:
-                    self.db.execute(
-                        "INSERT INTO places(place_id, data) VALUES(?, ?)",
-                        (
-                            place["id"],
-                            zlib.compress(json.dumps(place).encode("utf-8"))
-                        )
-                    )
-                    n_inserted += 1
-                except sqlite3.IntegrityError:
-                    pass
-
-        return n_inserted
+        # discard places that are repeated in this response or already stored
+        new_places = {}
+        for place in places:
+            place["scraped"] = scraped_datetime
+            new_places.setdefault(place["id"], place)
+        place_ids = list(new_places)
+        for i in range(0, len(place_ids), 500):
+            chunk = place_ids[i:i + 500]
+            for (place_id,) in self.db.execute(
+                "SELECT place_id FROM places_idx WHERE place_id IN ({})".format(
+                    ",".join("?" * len(chunk))
+                ),
+                chunk
+            ):
+                del new_places[place_id]
+
+        if not new_places:
+            return 0
+
+        payloads = [orjson.dumps(place) for place in new_places.values()]
+        self._insert_batch(list(new_places), payloads)
+
+        if self._zdict_dctx is None:
+            self._zdict_samples += payloads
+            if len(self._zdict_samples) >= self.ZSTD_DICT_SAMPLES:
+                self._train_zstd_dict()
+
+        return len(new_places)
+
+    def _insert_batch(self, place_ids: typing.List[str], payloads: typing.List[bytes]):
+        """ Store new places as a single batch.
+
+        Args:
+            place_ids: The IDs of the places to store. These must not already
+                be stored.
+            payloads: The JSON of each place, as bytes.
+        """
+
+        batch_id = self.db.execute(
+            "INSERT INTO batches(data) VALUES(?)",
+            (self._compress(b"\n".join(payloads)),)
+        ).lastrowid
+        self.db.executemany(
+            "INSERT INTO places_idx(place_id, batch_id, batch_offset) VALUES(?, ?, ?)",
+            [
+                (place_id, batch_id, batch_offset)
+                for batch_offset, place_id in enumerate(place_ids)
+            ]
+        )
+
+    def get_place(self, place_id: str) -> typing.Optional[dict]:
+        """ Retrieve a saved place.
+
+        Args:
+            place_id: The HERE ID of the place to retrieve.
+
+        Returns: The HERE place data if the place has been saved; otherwise,
+            None.
+        """
+
+        row = self.db.execute(
+            """
+                SELECT batches.data, places_idx.batch_offset
+                FROM places_idx JOIN batches USING(batch_id)
+                WHERE places_idx.place_id = ?
+            """,
+            (place_id,)
+        ).fetchone()
+        if row is not None:
+            (data, batch_offset) = row
+            return orjson.loads(
+                self._decompress(data).split(b"\n")[batch_offset]
+            )
+
+    def _iter_batches(self) -> typing.Generator[bytes]:
+        """ Iterate over saved batches of places.
+
+        Returns: A generator that yields the newline-delimited JSON of the
+            places in each batch.
+        """
+
+        cursor = self.db.execute("SELECT data FROM batches")
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for (data,) in rows:
+                yield self._decompress(data)
+        cursor.close()
 
     def iter_places(self) -> typing.Generator[dict]:
         """ Iterate over saved places.
@@ -321,24 +993,29 @@ class HerePlacesScraper:
         Returns: A generator that yields HERE place data.
         """
 
-        cursor = self.db.cursor()
-        cursor.execute("SELECT place_id, data FROM places")
-        for place in cursor:
-            (place_id, data) = place
-            yield json.loads(zlib.decompress(data))
-        cursor.close()
+        for batch in self._iter_batches():
+            for payload in batch.split(b"\n"):
+                yield orjson.loads(payload)
 
     def write_ndjson(self, output_path: str):
         """  Write stored POI data to an NDJSON file.
 
+        Places are written exactly as they are stored, without being decoded.
+
         Args:
-            output_path: The path to write data to.
+            output_path: The path to write data to. If this ends in ".zst", the
+                output is compressed with zstd.
         """
 
-        with open(output_path, "w") as output_fp:
-            for place in self.iter_places():
-                output_fp.write(json.dumps(place, separators=(",", ":")))
-                output_fp.write("\n")
+        with open(output_path, "wb", buffering=self.WRITE_BUFFER_SIZE) as output_fp:
+            if output_path.endswith(".zst"):
+                output_fp = zstandard.ZstdCompressor(
+                    level=self.ZSTD_LEVEL
+                ).stream_writer(output_fp)
+            with output_fp:
+                for batch in self._iter_batches():
+                    output_fp.write(batch)
+                    output_fp.write(b"\n")
 
     def write_csv(self, output_path: str):
         """  Write stored POI data to a CSV file.
@@ -350,31 +1027,44 @@ class HerePlacesScraper:
             output_path: The path to write data to.
         """
 
-        with open(output_path, "w") as output_fp:
-            writer = csv.DictWriter(
-                output_fp,
-                fieldnames=[
+        with open(output_path, "w", newline="",
+                  buffering=self.WRITE_BUFFER_SIZE) as output_fp:
+            writer = csv.writer(output_fp)
+            writer.writerow(
+                [
                     "lon", "lat", "id", "title", "street", "houseNumber", "postalCode",
                 ] + [
                     "category{}".format(i)
                     for i in range(1, self.MAX_CATEGORIES + 1)
                 ]
             )
-            writer.writeheader()
-            for place in self.iter_places():
-                row = {
-                    "lon": place["position"]["lng"],
-                    "lat": place["position"]["lat"],
-                    "id": place["id"],
-                    "street": place["address"].get("street"),
-                    "houseNumber": place["address"].get("houseNumber"),
-                    "postalCode": place["address"].get("postalCode")
-                }
-                for i, category in enumerate(place.get("categories", [])):
-                    if i == self.MAX_CATEGORIES:
-                        break
-                    row["category{}".format(i + 1)] = category["id"]
-                writer.writerow(row)
+            writer.writerows(self._iter_csv_rows())
+
+    def _iter_csv_rows(self) -> typing.Generator[tuple]:
+        """ Iterate over saved places, flattened into rows for write_csv.
+
+        Returns: A generator that yields tuples of CSV fields, in the same
+            order as the header written by write_csv.
+        """
+
+        padding = ("",) * self.MAX_CATEGORIES
+        for place in self.iter_places():
+            address = place["address"]
+            categories = tuple(
+                category["id"]
+                for category in place.get("categories", [])[:self.MAX_CATEGORIES]
+            )
+            yield (
+                place["position"]["lng"],
+                place["position"]["lat"],
+                place["id"],
+                place.get("title"),
+                address.get("street"),
+                address.get("houseNumber"),
+                address.get("postalCode"),
+                *categories,
+                *padding[len(categories):]
+            )
 
     def write_csv_v1(self, output_path: str):
         """  Write stored POI data to a CSV file.
@@ -388,96 +1078,458 @@ class HerePlacesScraper:
             output_path: The path to write data to.
         """
 
-        with open(output_path, "w") as output_fp:
-            writer = csv.DictWriter(
-                output_fp,
-                fieldnames=[
-                    "lon", "lat", "id", "title", "category", "averageRating"
-                ]
+        with open(output_path, "w", newline="",
+                  buffering=self.WRITE_BUFFER_SIZE) as output_fp:
+            writer = csv.writer(output_fp)
+            writer.writerow(
+                ["lon", "lat", "id", "title", "category", "averageRating"]
+            )
+            writer.writerows(
+                (
+                    place["position"][1],
+                    place["position"][0],
+                    place["id"],
+                    place["title"],
+                    place["category"]["id"],
+                    place["averageRating"]
+                )
+                for place in self.iter_places()
+            )
+
+    def _subdivide(self,
+                   rect: Rectangle,
+                   _id: T_SubdivisionID
+                   ) -> typing.List[T_Subdivision]:
+        """ Subdivide a rectangle into the next level of the recursion tree.
+
+        Args:
+            rect: The rectangle to subdivide.
+            _id: The unique identifier of the rectangle in the recursion tree.
+
+        Returns: A list of (subdivision, subdivision ID) tuples.
+        """
+
+        n_levels = rect.subdivision_depth(
+            rows=self.SUBDIVISION_ROWS, max_radius=self.MAX_RADIUS_KM,
+            max_radius_units=haversine.Unit.KILOMETERS
+        )
+        subdivisions = rect.subdivide_array(
+            rows=self.SUBDIVISION_ROWS, depth=n_levels
+        )
+
+        # if the rectangle had to be subdivided repeatedly to satisfy
+        # MAX_RADIUS_KM, subdivisions of each subdivision are contiguous, so
+        # each level adds one digit to the IDs of the level above
+        n_children = self.SUBDIVISION_ROWS ** 2
+        ids = [_id]
+        for _ in range(n_levels):
+            ids = [(parent << 4) | i for parent in ids for i in range(n_children)]
+        if ids[-1].bit_length() > 63:
+            raise Exception("Subdivision IDs of {} would not fit in 64 bits".format(
+                self._format_subdivision_id(_id)
+            ))
+
+        return [
+            (Rectangle(*bounds), new_id)
+            for bounds, new_id in zip(subdivisions.tolist(), ids)
+        ]
+
+    def _can_subdivide(self, rect: Rectangle, _id: T_SubdivisionID) -> bool:
+        """ Check whether a subdivision may be subdivided further; see
+        MAX_SUBDIVISION_DEPTH and MIN_SUBDIVISION_SIZE.
+
+        Args:
+            rect: The subdivision to check.
+            _id: The subdivision ID of the subdivision.
+
+        Returns: True if the subdivision may be subdivided.
+        """
+
+        depth = (_id.bit_length() - 1) // 4
+        size = max(rect.max_x - rect.min_x, rect.max_y - rect.min_y)
+        return (
+            depth < self.MAX_SUBDIVISION_DEPTH
+            and size / self.SUBDIVISION_ROWS >= self.MIN_SUBDIVISION_SIZE
+        )
+
+    @staticmethod
+    def _format_subdivision_id(_id: T_SubdivisionID) -> str:
+        """ Format a subdivision ID for display.
+
+        Args:
+            _id: The subdivision ID to format.
+
+        Returns: The index of the subdivision at each level of the recursion
+            tree, separated by commas, or "root" for the root rectangle.
+        """
+
+        return ",".join(hex(_id)[3:]) or "root"
+
+    def _save_scrape_state(self,
+                           root: str,
+                           subdivisions: typing.List[T_Subdivision]):
+        """ Record subdivisions as pending in the scrape state.
+
+        Args:
+            root: The bounding box of the rectangle being scraped.
+            subdivisions: A list of (subdivision, subdivision ID) tuples.
+        """
+
+        self.db.executemany(
+            """
+                INSERT OR IGNORE INTO scrape_state(
+                    root, subdivision_id, min_x, min_y, max_x, max_y
+                ) VALUES(?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (root, _id, *subdivision.to_tuple())
+                for subdivision, _id in subdivisions
+            ]
+        )
+
+    def _load_scrape_state(self, root: str) -> typing.List[T_Subdivision]:
+        """ Retrieve the pending subdivisions of an interrupted scrape.
+
+        Args:
+            root: The bounding box of the rectangle being scraped.
+
+        Returns: A list of (subdivision, subdivision ID) tuples.
+        """
+
+        return [
+            (Rectangle(min_x, min_y, max_x, max_y), subdivision_id)
+            for (subdivision_id, min_x, min_y, max_x, max_y) in self.db.execute(
+                """
+                    SELECT subdivision_id, min_x, min_y, max_x, max_y
+                    FROM scrape_state WHERE root = ?
+                """,
+                (root,)
             )
-            writer.writeheader()
-            for place in self.iter_places():
-                writer.writerow({
-                    "lon": place["position"][1],
-                    "lat": place["position"][0],
-                    "id": place["id"],
-                    "title": place["title"],
-                    "category": place["category"]["id"],
-                    "averageRating": place["averageRating"]
-                })
-
-    def scrape(self,
-               rect: Rectangle,
-               skip_to: typing.Optional[T_SubdivisionID] = None,
-               _id: T_SubdivisionID = [],
-               ):
+        ]
+
+    def _request_key(self, rect: Rectangle) -> str:
+        """ Generate a key identifying a browse request.
+
+        Args:
+            rect: The rectangle being browsed.
+
+        Returns: A string that is unique to the API and rectangle.
+        """
+
+        return "{}:{},{},{},{}".format(type(self.here).__name__, *rect.to_tuple())
+
+    def _get_cached_responses(self,
+                              rects: typing.List[Rectangle]
+                              ) -> typing.Dict[str, int]:
+        """ Check which rectangles have been browsed recently.
+
+        Args:
+            rects: The rectangles being browsed.
+
+        Returns: A dict mapping the request key of each rectangle that was
+            browsed within response_ttl to the number of places found in it.
+        """
+
+        request_keys = [self._request_key(rect) for rect in rects]
+        fetched_after = (datetime.datetime.now() - self.response_ttl).timestamp()
+        cached = {}
+        for i in range(0, len(request_keys), 500):
+            chunk = request_keys[i:i + 500]
+            cached.update(self.db.execute(
+                """
+                    SELECT request_key, n_places FROM responses
+                    WHERE request_key IN ({}) AND fetched >= ?
+                """.format(",".join("?" * len(chunk))),
+                chunk + [fetched_after]
+            ))
+        return cached
+
+    def scrape(self, rect: Rectangle):
         """ Scrape HERE places.
 
+        Progress is saved to the database as scraping proceeds. If a previous
+        scrape of the same rectangle was interrupted, or some of its requests
+        failed, it is resumed instead of being started from scratch.
+        Subdivisions that were requested within response_ttl are not
+        requested again. Progress is also saved if scraping is interrupted
+        with Ctrl-C.
+
         Args:
             rect: The rectangle to scrape.
-            skip_to: The recursion tree to skip to, if desired.
-            _id: Do not use - this is a unique identifier of the current
-                recursion tree.
         """
 
-        # TODO: there's probably a better way to implement skipping
-        # functionality - look into later
+        asyncio.run(self._scrape_async(rect))
+
+    async def _scrape_async(self, rect: Rectangle):
+        """ Scrape HERE places, one level of the recursion tree at a time.
+
+        Args:
+            rect: The rectangle to scrape.
+        """
 
         if self.here is None:
             raise Exception("No app_id or app_code provided")
 
-        subdivisions = rect.subdivide(
-            rows=3, max_radius=self.MAX_RADIUS_KM,
-            max_radius_units=haversine.Unit.KILOMETERS
+        root = "{},{},{},{}".format(*rect.to_tuple())
+        queue = collections.deque(self._load_scrape_state(root))
+        if queue:
+            if self.verbose:
+                sys.stdout.write(self.MESSAGE_RESUMING.format(len(queue)))
+        else:
+            # the root rectangle is only subdivided up front if it is too
+            # large to browse; after that, subdivisions are only subdivided
+            # further if they are too dense to be browsed in one request
+            if rect.radius(haversine.Unit.KILOMETERS) <= self.MAX_RADIUS_KM:
+                queue.append((rect, self.ROOT_SUBDIVISION_ID))
+            else:
+                queue.extend(self._subdivide(rect, self.ROOT_SUBDIVISION_ID))
+            with self._transaction():
+                self._save_scrape_state(root, list(queue))
+
+        n_failed = 0
+        n_too_dense = self.n_too_dense_subdivisions
+        async with self.here:
+            # the scrape state is consistent whenever _scrape_level awaits
+            # a response, which is where any interrupt is raised
+            with self._transaction(commit_on_interrupt=True):
+                # responses are only pruned once stale by the default TTL
+                # too, so that refreshing one area keeps the rest cached
+                prune_ttl = max(self.response_ttl, self.RESPONSE_TTL)
+                self.db.execute(
+                    "DELETE FROM responses WHERE fetched < ?",
+                    ((datetime.datetime.now() - prune_ttl).timestamp(),)
+                )
+                self._reset_commit_interval()
+                while queue:
+                    level = [queue.popleft() for _ in range(len(queue))]
+                    next_level, failed = await self._scrape_level(root, level)
+                    queue.extend(next_level)
+                    n_failed += len(failed)
+
+        if n_failed and self.verbose:
+            sys.stdout.write(self.MESSAGE_N_FAILED.format(n_failed))
+        n_too_dense = self.n_too_dense_subdivisions - n_too_dense
+        if n_too_dense and self.verbose:
+            sys.stdout.write(self.MESSAGE_N_TOO_DENSE.format(n_too_dense))
+
+    def _finish_subdivision(self,
+                            root: str,
+                            subdivision: Rectangle,
+                            _id: T_SubdivisionID,
+                            n_places: int
+                            ) -> typing.List[T_Subdivision]:
+        """ Mark a subdivision as done in the scrape state, queueing its own
+        subdivisions if it needs to be scraped more finely.
+
+        Args:
+            root: The bounding box of the rectangle being scraped.
+            subdivision: The subdivision that was scraped.
+            _id: The subdivision ID of the subdivision.
+            n_places: The number of places found in the subdivision.
+
+        Returns: A list of (subdivision, subdivision ID) tuples to scrape next.
+        """
+
+        self.db.execute(
+            "DELETE FROM scrape_state WHERE root = ? AND subdivision_id = ?",
+            (root, _id)
         )
+        if n_places > 90:
+            if self._can_subdivide(subdivision, _id):
+                next_subdivisions = self._subdivide(subdivision, _id)
+                self._save_scrape_state(root, next_subdivisions)
+                return next_subdivisions
+            self.n_too_dense_subdivisions += 1
+            if self.verbose:
+                sys.stdout.write(self.MESSAGE_TOO_DENSE.format(
+                    self._format_subdivision_id(_id)
+                ))
+        return []
+
+    def _reset_commit_interval(self):
+        """ Start counting progress towards the next commit of a running
+        scrape from now.
+        """
 
-        for i, subdivision in enumerate(subdivisions):
-            new_id = _id + [i]
-            new_id_str = ",".join(map(str, new_id))
-
-            # skipping functionality part 1
-            if skip_to == _id:
-                skip_to = None
-            elif skip_to is not None:
-                skip_to_cropped = skip_to[:len(new_id)]
-                if skip_to_cropped < new_id:
-                    skip_to = None
-
-            if skip_to is None:
-                request_time = datetime.datetime.now()
-                places = self.here.browse(subdivision)
-                n_new_places = self.insert_places(places, request_time)
-
-                self.n_requests_made += 1
-                self.n_places_encountered += len(places)
-                self.n_total_new_places += n_new_places
-
-                message = "\n".join([
-                    "Subdivision ID: {}".format(new_id_str),
-                    "Bounding box: {},{},{},{}".format(
-                        *subdivision.to_tuple()
-                    ),
-                    "In this subdivision: found {} places ({} new)".format(len(places), n_new_places),
-                    "Since scraping started: made {} requests; encountered {} places ({} new)".format(
-                        self.n_requests_made, self.n_places_encountered, self.n_total_new_places
-                    )
-                ])
-                print(message, end="\n\n")
-
-                if len(places) > 90:
-                    self.scrape(subdivision, skip_to, new_id)
-
-            # skipping functionality part 2
-            else:
-                print("skipped")
-                if skip_to_cropped == new_id:
-                    self.scrape(subdivision, skip_to, new_id)
+        self._n_committed_places = self.n_total_new_places
+        self._n_uncommitted_subdivisions = 0
+        self._commit_time = time.monotonic()
+
+    def _commit_progress(self):
+        """ Count a finished subdivision towards the next commit of a running
+        scrape, committing if any of the COMMIT_INTERVALs has been reached.
+        """
+
+        self._n_uncommitted_subdivisions += 1
+        if (
+            self.n_total_new_places - self._n_committed_places >= self.COMMIT_INTERVAL
+            or self._n_uncommitted_subdivisions >= self.COMMIT_INTERVAL_SUBDIVISIONS
+            or time.monotonic() - self._commit_time >= self.COMMIT_INTERVAL_SECONDS
+        ):
+            self.db.execute("COMMIT")
+            self.db.execute("BEGIN IMMEDIATE")
+            self._reset_commit_interval()
+
+    async def _browse(self,
+                      subdivision: Rectangle,
+                      _id: T_SubdivisionID
+                      ) -> typing.Tuple[Rectangle, T_SubdivisionID, datetime.datetime, typing.Any]:
+        """ Browse a subdivision, capturing any exception raised.
+
+        Args:
+            subdivision: The subdivision to browse.
+            _id: The subdivision ID of the subdivision.
+
+        Returns: A tuple containing the subdivision, its ID, the time of the
+            request and either the places found or the exception raised.
+        """
+
+        request_time = datetime.datetime.now()
+        try:
+            places = await self.here.browse(subdivision)
+        except Exception as e:
+            places = e
+        return subdivision, _id, request_time, places
+
+    async def _scrape_level(self,
+                            root: str,
+                            level: typing.List[T_Subdivision]
+                            ) -> typing.Tuple[typing.List[T_Subdivision], typing.List[T_Subdivision]]:
+        """ Concurrently scrape all subdivisions at one level of the recursion
+        tree.
+
+        Responses are stored as soon as they arrive, while the remaining
+        requests are still in flight. This must be run in a transaction; it
+        is committed periodically, see COMMIT_INTERVAL. The scrape state is
+        updated along with the places from each response, so a scrape can be
+        resumed from any commit.
+
+        Args:
+            root: The bounding box of the rectangle being scraped.
+            level: A list of (subdivision, subdivision ID) tuples to scrape.
+
+        Returns: A tuple containing the (subdivision, subdivision ID) tuples
+            making up the next level of the recursion tree and those that
+            could not be scraped. The latter remain pending in the scrape
+            state.
+        """
+
+        # give Ctrl-C a chance to cancel the scrape even if every
+        # subdivision at this level was requested recently, as no other
+        # await is reached in that case
+        await asyncio.sleep(0)
+
+        next_level = []
+        failed = []
+        to_request = []
+
+        cached = self._get_cached_responses(
+            [subdivision for subdivision, _id in level]
+        )
+        for subdivision, _id in level:
+            n_places = cached.get(self._request_key(subdivision))
+            if n_places is None:
+                to_request.append((subdivision, _id))
+                continue
+
+            if self.verbose:
+                sys.stdout.write(self.MESSAGE_CACHED.format(
+                    self._format_subdivision_id(_id),
+                    *subdivision.to_tuple(),
+                    n_places
+                ))
+            next_level += self._finish_subdivision(root, subdivision, _id, n_places)
+            self._commit_progress()
+
+        for response in asyncio.as_completed([
+            self._browse(subdivision, _id) for subdivision, _id in to_request
+        ]):
+            subdivision, _id, request_time, places = await response
+
+            if isinstance(places, Exception):
+                if self.verbose:
+                    sys.stdout.write(self.MESSAGE_FAILED.format(
+                        self._format_subdivision_id(_id), places
+                    ))
+                failed.append((subdivision, _id))
+                continue
+
+            n_new_places = self._insert_places(places, request_time)
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses(request_key, n_places, fetched) VALUES(?, ?, ?)",
+                (
+                    self._request_key(subdivision),
+                    len(places),
+                    request_time.timestamp()
+                )
+            )
+
+            self.n_requests_made += 1
+            self.n_places_encountered += len(places)
+            self.n_total_new_places += n_new_places
+
+            if self.verbose:
+                sys.stdout.write(self.MESSAGE_SCRAPED.format(
+                    self._format_subdivision_id(_id),
+                    *subdivision.to_tuple(),
+                    len(places), n_new_places,
+                    self.n_requests_made, self.n_places_encountered,
+                    self.n_total_new_places
+                ))
+
+            next_level += self._finish_subdivision(root, subdivision, _id, len(places))
+            self._commit_progress()
+
+        return next_level, failed
 
 
 if __name__ == "__main__":
 
     import argparse
 
+    def parse_rectangle(value: str) -> Rectangle:
+        """ Parse a rectangle given on the command line as
+        "(min_lon,min_lat,max_lon,max_lat)"; the parentheses are optional.
+        Longitudes must be within [-180, 180], latitudes within [-90, 90], and
+        each minimum must be less than its maximum.
+        """
+
+        bounds = value.strip().strip("()").split(",")
+        try:
+            if len(bounds) != 4:
+                raise ValueError
+            min_lon, min_lat, max_lon, max_lat = map(float, bounds)
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                "expected \"(min_lon,min_lat,max_lon,max_lat)\", got {!r}".format(value)
+            )
+
+        # comparisons with nan are always False, so nan is rejected too
+        if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+            raise argparse.ArgumentTypeError(
+                "expected -180 <= min_lon < max_lon <= 180 and "
+                "-90 <= min_lat < max_lat <= 90, got {!r}".format(value)
+            )
+        return Rectangle(min_lon, min_lat, max_lon, max_lat)
+
+    def positive(parse: typing.Callable[[str], typing.Any]
+                 ) -> typing.Callable[[str], typing.Any]:
+        """ Wrap an argument type so that only positive values are accepted.
+        """
+
+        def parse_positive(value: str):
+            try:
+                parsed = parse(value)
+            except ValueError:
+                parsed = None
+            if parsed is None or not parsed > 0 or not math.isfinite(parsed):
+                raise argparse.ArgumentTypeError(
+                    "expected a positive number, got {!r}".format(value)
+                )
+            return parsed
+
+        return parse_positive
+
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(help="Command", dest="command", required=True)
 
@@ -485,12 +1537,18 @@ if __name__ == "__main__":
 
     scrape_parser = subparsers.add_parser("scrape")
     scrape_parser.add_argument("-a", "--api-key", help="The HERE API key to use for authentication", required=True)
-    scrape_parser.add_argument("-r", "--rectangle", help="The rectangle to scrape, in the format \"(min_lon,min_lat,max_lon,max_lat)\"", required=True)
+    scrape_parser.add_argument("-r", "--rectangle", help="The rectangle to scrape, in the format \"(min_lon,min_lat,max_lon,max_lat)\"", type=parse_rectangle, required=True)
+    scrape_parser.add_argument("-c", "--concurrency", help="The maximum number of concurrent requests to make", type=positive(int), default=10)
+    scrape_parser.add_argument("-l", "--rate-limit", help="The maximum number of requests to make per second", type=positive(float))
+    scrape_parser.add_argument("-R", "--refresh", help="Request every subdivision again, even if it was requested recently", action="store_true")
 
     scrape_v1_parser = subparsers.add_parser("scrape_v1")
     scrape_v1_parser.add_argument("-a", "--app-id", help="The HERE app ID to use for authentication", required=True)
     scrape_v1_parser.add_argument("-A", "--app-code", help="The HERE app code to use for authentication", required=True)
-    scrape_v1_parser.add_argument("-r", "--rectangle", help="The rectangle to scrape, in the format \"(min_lon,min_lat,max_lon,max_lat)\"", required=True)
+    scrape_v1_parser.add_argument("-r", "--rectangle", help="The rectangle to scrape, in the format \"(min_lon,min_lat,max_lon,max_lat)\"", type=parse_rectangle, required=True)
+    scrape_v1_parser.add_argument("-c", "--concurrency", help="The maximum number of concurrent requests to make", type=positive(int), default=10)
+    scrape_v1_parser.add_argument("-l", "--rate-limit", help="The maximum number of requests to make per second", type=positive(float))
+    scrape_v1_parser.add_argument("-R", "--refresh", help="Request every subdivision again, even if it was requested recently", action="store_true")
 
     export_parser = subparsers.add_parser("export")
     export_parser.add_argument("-f", "--format", help="The format to export places in", choices=("csv", "json"), required=True)
@@ -499,15 +1557,16 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    rectangle = Rectangle(*eval(args.rectangle))  # TODO: very hacky
+    if args.command in ("scrape", "scrape_v1"):
+        response_ttl = datetime.timedelta(0) if args.refresh else HerePlacesScraper.RESPONSE_TTL
 
     if args.command == "scrape":
-        scraper = HerePlacesScraper(args.db, api_key=args.api_key)
-        scraper.scrape(rectangle)
+        scraper = HerePlacesScraper(args.db, api_key=args.api_key, concurrency=args.concurrency, rate_limit=args.rate_limit, response_ttl=response_ttl)
+        scraper.scrape(args.rectangle)
 
     elif args.command == "scrape_v1":
-        scraper = HerePlacesScraper(args.db, app_id=args.app_id, app_code=args.app_code)
-        scraper.scrape(rectangle)
+        scraper = HerePlacesScraper(args.db, app_id=args.app_id, app_code=args.app_code, concurrency=args.concurrency, rate_limit=args.rate_limit, response_ttl=response_ttl)
+        scraper.scrape(args.rectangle)
 
     elif args.command == "export":
         scraper = HerePlacesScraper(args.db)